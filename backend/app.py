@@ -1,5 +1,5 @@
 from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Response, Cookie, Request, BackgroundTasks
-from fastapi.responses import StreamingResponse, RedirectResponse, Response
+from fastapi.responses import RedirectResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pymongo import MongoClient
 from bson import ObjectId
@@ -14,6 +14,10 @@ import string
 from mutagen.mp3 import MP3
 
 from send_email import send_otp_email, send_welcome_email, send_password_email, send_password_update_email
+from indexes import ensure_indexes, SESSION_TIMEOUT
+from text_normalize import normalize_pages
+from audio_storage import AudioNotFound, GridFSAudioStore, LocalAudioStore
+from profiler import RequestProfiler, ProfilingMiddleware, ProfiledRoute, sample_process, collapse
 
 # ------------------ LOAD ENV ------------------
 load_dotenv()
@@ -24,16 +28,32 @@ client = MongoClient(MONGO_URI)
 db = client["lysn"]
 users = db["users"]
 audio_metadata = db["audio_metadata"]
-# Ensure unique index on (user, filename) to prevent duplicates per user
-try:
-    audio_metadata.create_index([("user", 1), ("filename", 1)], unique=True)
-    print("✓ Indexing check complete: unique constraint on (user, filename) enforced.")
-except Exception as e:
-    print(f"Warning: Could not create unique index on audio_metadata: {e}")
-
 sessions = db["sessions"]
+user_stats = db["user_stats"]
+# Apply the index registry (see indexes.py), including the sessions TTL index
+ensure_indexes(db)
+
 fs = gridfs.GridFS(db)
 
+# Audio blob storage: new uploads go to AUDIO_STORAGE ("gridfs" or "local"),
+# existing audios are read from whichever backend their metadata names.
+AUDIO_STORAGE = os.getenv("AUDIO_STORAGE", "gridfs")
+# Relative paths resolve against this directory, not the process cwd, so uvicorn and
+# manage.py always agree on where migrated audios live
+AUDIO_STORAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv("AUDIO_STORAGE_PATH", "audio_store"))
+audio_stores = {
+    "gridfs": GridFSAudioStore(fs),
+    "local": LocalAudioStore(AUDIO_STORAGE_PATH, accel_prefix=os.getenv("AUDIO_ACCEL_REDIRECT_PREFIX")),
+}
+if AUDIO_STORAGE not in audio_stores:
+    raise RuntimeError(f"Unknown AUDIO_STORAGE '{AUDIO_STORAGE}', expected one of: {', '.join(audio_stores)}")
+
+def get_audio_store(metadata=None):
+    """Backend holding the given audio, or the upload backend when metadata is None"""
+    if metadata is None:
+        return audio_stores[AUDIO_STORAGE]
+    return audio_stores[metadata.get("storage") or "gridfs"]
+
 # ------------------ HELPERS ------------------
 def get_kolkata_time():
     """Returns the current time in Kolkata (UTC+5:30)"""
@@ -46,6 +66,8 @@ REDIRECT_URI = os.getenv("REDIRECT_URI")
 
 # FastAPI setup
 app = FastAPI(title="Lysn")
+# Lets request profiling follow sync endpoints into their threadpool thread
+app.router.route_class = ProfiledRoute
 
 # Get allowed origins (comma separated)
 ALLOWED_ORIGINS = [o.strip().rstrip("/") for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")]
@@ -58,6 +80,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiles the next K requests to an armed route, idle otherwise (see profiler.py)
+request_profiler = RequestProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Admins (comma separated emails) can use the /admin endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
 def get_cookie_settings(origin: str):
     """Determine cookie settings based on the request origin."""
     is_https = origin and origin.startswith("https://")
@@ -107,8 +136,8 @@ def generate_temp_password(length=12):
 OTPS = {}      # { email: { "otp": str, "expires_at": datetime, "name": str } }
 
 # ------------------ DATABASE SESSIONS ------------------
-SESSION_TIMEOUT = timedelta(days=7)
-
+# The TTL index on sessions.last_active (see indexes.py) deletes idle sessions;
+# get_current_user also checks last_active to cover the TTL monitor's ~60s lag.
 def create_session(email: str):
     token = secrets.token_urlsafe(32)
     sessions.update_one(
@@ -141,6 +170,11 @@ def get_current_user(session_token: str = Cookie(None)):
     )
     return session["email"]
 
+def get_admin_user(email: str = Depends(get_current_user)):
+    if email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return email
+
 def logout_user(session_token: str):
     if session_token:
         sessions.delete_one({"token": session_token})
@@ -149,6 +183,87 @@ def logout_user(session_token: str):
 def generate_otp():
     return str(random.randint(100000, 999999))
 
+# ------------------ LIBRARY STATS ------------------
+# One document per user in `user_stats`, kept up to date with $inc on every
+# upload/delete so the dashboard never has to scan audio_metadata.
+# Note: last_upload only moves forward; deleting the newest audio leaves it
+# stale until the next reconcile.
+
+def record_audio_added(email: str, duration: float, size: int, uploaded: datetime):
+    result = user_stats.update_one(
+        {"user": email},
+        {
+            "$inc": {"count": 1, "total_duration": duration, "total_bytes": size},
+            "$max": {"last_upload": uploaded},
+        },
+    )
+    # No counters yet (library predates user_stats): build them from audio_metadata,
+    # which already includes this upload, instead of starting a partial document
+    if not result.matched_count:
+        reconcile_user_stats(email)
+
+def record_audio_removed(email: str, duration: float, size: int):
+    user_stats.update_one(
+        {"user": email},
+        {"$inc": {"count": -1, "total_duration": -duration, "total_bytes": -size}},
+    )
+
+def reconcile_user_stats(email: str = None):
+    """Rebuild user_stats from audio_metadata. Rebuilds every user when email is None."""
+    # Every document written by this run carries its id, anything else is stale
+    run_id = ObjectId()
+    pipeline = []
+    if email:
+        pipeline.append({"$match": {"user": email}})
+    pipeline += [
+        # Older records have no "size", fall back to the GridFS file length
+        {"$lookup": {"from": "fs.files", "localField": "audio_id", "foreignField": "_id", "as": "blob"}},
+        {"$group": {
+            "_id": "$user",
+            "count": {"$sum": 1},
+            "total_duration": {"$sum": {"$ifNull": ["$duration", 0]}},
+            "total_bytes": {"$sum": {"$ifNull": ["$size", {"$ifNull": [{"$arrayElemAt": ["$blob.length", 0]}, 0]}]}},
+            "last_upload": {"$max": "$uploaded"},
+        }},
+        {"$project": {"_id": 0, "user": "$_id", "count": 1, "total_duration": 1, "total_bytes": 1, "last_upload": 1, "run_id": {"$literal": run_id}}},
+        # Written server-side in one pass, relies on the unique index on user_stats.user
+        {"$merge": {"into": "user_stats", "on": "user", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    audio_metadata.aggregate(pipeline)
+
+    if email:
+        if user_stats.find_one({"user": email, "run_id": run_id}, {"_id": 1}):
+            return 1
+        # Keep an explicit zero document so an empty library isn't rebuilt on every read
+        user_stats.replace_one(
+            {"user": email},
+            {"user": email, "count": 0, "total_duration": 0, "total_bytes": 0, "last_upload": None, "run_id": run_id},
+            upsert=True,
+        )
+        return 0
+
+    # Users whose library is now empty weren't stamped by this run, drop their counters
+    user_stats.delete_many({"run_id": {"$ne": run_id}})
+    return user_stats.count_documents({"run_id": run_id})
+
+def get_user_stats(email: str):
+    stats = user_stats.find_one({"user": email}, {"_id": 0, "user": 0})
+    if stats is None:
+        # First read for this user, backfill from audio_metadata
+        reconcile_user_stats(email)
+        stats = user_stats.find_one({"user": email}, {"_id": 0, "user": 0}) or {}
+    last_upload = stats.get("last_upload")
+    return {
+        "count": stats.get("count", 0),
+        "total_duration": stats.get("total_duration", 0),
+        "total_bytes": stats.get("total_bytes", 0),
+        "last_upload": (
+            last_upload.strftime("%Y-%m-%d %H:%M:%S")
+            if isinstance(last_upload, datetime)
+            else last_upload
+        ),
+    }
+
 # ------------------ ROUTES ------------------
 @app.get("/")
 def root():
@@ -469,7 +584,10 @@ def upload_pdf(file: UploadFile = File(...), email: str = Depends(get_current_us
         )
 
     pdf_reader = PyPDF2.PdfReader(file.file)
-    text = "".join([page.extract_text() or "" for page in pdf_reader.pages])
+    pages = [page.extract_text() or "" for page in pdf_reader.pages]
+
+    # Drop running headers/footers and page numbers so they aren't read aloud on every page
+    text, chars_removed = normalize_pages(pages)
 
     if not text.strip():
         raise HTTPException(status_code=400, detail="PDF has no readable text")
@@ -478,9 +596,12 @@ def upload_pdf(file: UploadFile = File(...), email: str = Depends(get_current_us
     audio_buffer = BytesIO()
     tts.write_to_fp(audio_buffer)
     audio_buffer.seek(0)
+    audio_size = audio_buffer.getbuffer().nbytes
 
-    # Store audio in GridFS
-    audio_id = fs.put(audio_buffer, filename=audio_filename, user=email)
+    # Store audio in the configured backend
+    store = get_audio_store()
+    audio_id = ObjectId()
+    store.put(audio_buffer, audio_id, audio_filename, email)
     
     # Calculate duration from the generated MP3
     audio_buffer.seek(0)
@@ -490,15 +611,26 @@ def upload_pdf(file: UploadFile = File(...), email: str = Depends(get_current_us
     except Exception:
         duration_seconds = 0  # Fallback if duration can't be calculated
     
+    uploaded = get_kolkata_time()
     audio_metadata.insert_one({
         "user": email, 
         "audio_id": audio_id, 
         "filename": audio_filename,
+        "storage": store.name,
         "duration": duration_seconds,
-        "uploaded": get_kolkata_time()
+        "size": audio_size,
+        "chars": len(text),
+        "chars_removed": chars_removed,
+        "uploaded": uploaded
     })
+    record_audio_added(email, duration_seconds, audio_size, uploaded)
 
-    return {"message": "Audio generated", "audio_id": str(audio_id), "duration": duration_seconds}
+    return {
+        "message": "Audio generated",
+        "audio_id": str(audio_id),
+        "duration": duration_seconds,
+        "chars_removed": chars_removed,
+    }
 
 @app.get("/audio/{audio_id}")
 def get_audio(audio_id: str, request: Request):
@@ -506,43 +638,26 @@ def get_audio(audio_id: str, request: Request):
         if not ObjectId.is_valid(audio_id):
             raise HTTPException(status_code=400, detail="Invalid audio ID")
 
-        file = fs.get(ObjectId(audio_id))
-        file_size = file.length
-        
-        range_header = request.headers.get("range")
-        if not range_header:
-            return StreamingResponse(file, media_type="audio/mpeg", headers={"Accept-Ranges": "bytes"})
-            
-        start, end = range_header.replace("bytes=", "").split("-")
-        start = int(start)
-        end = int(end) if end else file_size - 1
-        
-        if start >= file_size:
-            raise HTTPException(status_code=416, detail="Range not satisfiable")
-            
-        chunk_size = end - start + 1
-        file.seek(start)
-        
-        def iterfile():
-            yield file.read(chunk_size)
-            
-        headers = {
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(chunk_size),
-        }
-        
-        return StreamingResponse(iterfile(), status_code=206, media_type="audio/mpeg", headers=headers)
-        
-    except gridfs.errors.NoFile:
+        metadata = audio_metadata.find_one({"audio_id": ObjectId(audio_id)}, {"storage": 1})
+        return get_audio_store(metadata or {}).serve(ObjectId(audio_id), request)
+
+    except AudioNotFound:
         raise HTTPException(status_code=404, detail="Audio not found")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error serving audio: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/audios_list")
-def list_audios(email: str = Depends(get_current_user)):
+def list_audios(limit: int = None, email: str = Depends(get_current_user)):
+    """All of the user's audios, or only the `limit` most recent ones"""
+    if limit is not None and limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
     records = audio_metadata.find({"user": email})
+    if limit is not None:
+        records = records.sort("uploaded", -1).limit(limit)
     audios = [
         {
             "audio_id": str(r["audio_id"]),
@@ -560,21 +675,72 @@ def list_audios(email: str = Depends(get_current_user)):
 
 @app.delete("/audio/{audio_id}")
 def delete_audio(audio_id: str, email: str = Depends(get_current_user)):
-    """Delete audio file from GridFS and metadata from database"""
+    """Delete audio file from its storage backend and metadata from database"""
     try:
         # Verify the audio belongs to the user
         metadata = audio_metadata.find_one({"audio_id": ObjectId(audio_id), "user": email})
         if not metadata:
             raise HTTPException(status_code=404, detail="Audio not found or unauthorized")
         
-        # Delete from GridFS (this removes all chunks automatically)
-        fs.delete(ObjectId(audio_id))
+        store = get_audio_store(metadata)
+
+        # Older records predate the "size" field, read it off the stored file instead
+        audio_size = metadata.get("size")
+        if audio_size is None:
+            try:
+                audio_size = store.size(ObjectId(audio_id))
+            except AudioNotFound:
+                audio_size = 0
+
+        store.delete(ObjectId(audio_id))
         
         # Delete metadata from database
-        audio_metadata.delete_one({"audio_id": ObjectId(audio_id)})
+        result = audio_metadata.delete_one({"audio_id": ObjectId(audio_id)})
+        if result.deleted_count:
+            record_audio_removed(email, metadata.get("duration", 0), audio_size)
         
         return {"message": "Audio deleted successfully", "audio_id": audio_id}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete audio: {str(e)}")
+
+@app.get("/stats")
+def library_stats(email: str = Depends(get_current_user)):
+    """Aggregate library counters for the dashboard (single document read)"""
+    return {"stats": get_user_stats(email)}
+
+@app.post("/stats/reconcile")
+def reconcile_stats(email: str = Depends(get_current_user)):
+    """Rebuild the caller's counters from audio_metadata if they have drifted"""
+    reconcile_user_stats(email)
+    return {"message": "Stats reconciled", "stats": get_user_stats(email)}
+
+# ---------- ADMIN : PROFILING ----------
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_REQUESTS = 100
+
+@app.get("/admin/profile/sample", response_class=PlainTextResponse)
+def profile_process(seconds: float = 10, email: str = Depends(get_admin_user)):
+    """Sample the whole worker for N seconds and return collapsed stacks"""
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+    return collapse(sample_process(seconds))
+
+@app.post("/admin/profile/requests")
+def arm_request_profile(path: str = Form(...), count: int = Form(1), email: str = Depends(get_admin_user)):
+    """Profile the next `count` requests whose path starts with `path` (e.g. /pdf/upload, /audio/)"""
+    if not 0 < count <= MAX_PROFILE_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_PROFILE_REQUESTS}")
+    request_profiler.arm(path, count)
+    return {"message": f"Profiling the next {count} requests to {path}", **request_profiler.status(path)}
+
+@app.get("/admin/profile/requests")
+def request_profile_status(path: str, email: str = Depends(get_admin_user)):
+    """Requests left to profile for `path` and samples collected so far"""
+    return request_profiler.status(path)
+
+@app.get("/admin/profile/requests/result", response_class=PlainTextResponse)
+def request_profile_result(path: str, email: str = Depends(get_admin_user)):
+    """Collapsed stacks gathered so far for `path`. Clears them."""
+    return collapse(request_profiler.take(path))
@@ -0,0 +1,218 @@
+"""
+Audio blob storage backends.
+
+Metadata always lives in Mongo (audio_metadata); the MP3 bytes live in one of the
+stores below. Each audio_metadata record carries a "storage" field naming its
+backend, records without one predate this module and are in GridFS.
+
+    gridfs  - bytes in Mongo's fs.files/fs.chunks (original behaviour)
+    local   - bytes on disk (or a mounted volume). Served with FileResponse, which
+              handles Range requests but still reads the file in Python under
+              uvicorn. Behind nginx, set accel_prefix so nginx sends the file
+              itself (sendfile, zero-copy) via X-Accel-Redirect.
+"""
+import os
+import shutil
+import tempfile
+
+import gridfs
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, StreamingResponse, Response
+
+
+FILE_MODE = 0o644
+
+
+class AudioNotFound(Exception):
+    pass
+
+
+class AudioStore:
+    """Interface shared by all audio backends. Audio ids are ObjectIds."""
+    name = None
+
+    def put(self, fileobj, audio_id, filename: str, user: str):
+        raise NotImplementedError
+
+    def open(self, audio_id):
+        """Return a readable file object for the audio bytes."""
+        raise NotImplementedError
+
+    def size(self, audio_id):
+        raise NotImplementedError
+
+    def delete(self, audio_id):
+        raise NotImplementedError
+
+    def serve(self, audio_id, request):
+        """Build the HTTP response for /audio/{audio_id}, honouring Range headers."""
+        raise NotImplementedError
+
+
+class GridFSAudioStore(AudioStore):
+    name = "gridfs"
+
+    def __init__(self, fs: gridfs.GridFS):
+        self.fs = fs
+
+    def put(self, fileobj, audio_id, filename: str, user: str):
+        self.fs.put(fileobj, _id=audio_id, filename=filename, user=user)
+
+    def open(self, audio_id):
+        try:
+            return self.fs.get(audio_id)
+        except gridfs.errors.NoFile:
+            raise AudioNotFound(str(audio_id))
+
+    def size(self, audio_id):
+        return self.open(audio_id).length
+
+    def delete(self, audio_id):
+        # Removes all chunks as well
+        self.fs.delete(audio_id)
+
+    def serve(self, audio_id, request):
+        file = self.open(audio_id)
+        file_size = file.length
+
+        range_header = request.headers.get("range")
+        if not range_header:
+            return StreamingResponse(file, media_type="audio/mpeg", headers={"Accept-Ranges": "bytes"})
+
+        start, end = range_header.replace("bytes=", "").split("-")
+        start = int(start)
+        end = int(end) if end else file_size - 1
+
+        if start >= file_size:
+            raise HTTPException(status_code=416, detail="Range not satisfiable")
+
+        chunk_size = end - start + 1
+        file.seek(start)
+
+        def iterfile():
+            yield file.read(chunk_size)
+
+        headers = {
+            "Content-Range": f"bytes {start}-{end}/{file_size}",
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(chunk_size),
+        }
+
+        return StreamingResponse(iterfile(), status_code=206, media_type="audio/mpeg", headers=headers)
+
+
+class LocalAudioStore(AudioStore):
+    """
+    Files are sharded by the last hex digits of the id (root/ab/cd/<id>.mp3)
+    to keep directories small. The leading digits of an ObjectId are a timestamp,
+    the trailing ones a counter, so they spread files far more evenly.
+    """
+    name = "local"
+
+    def __init__(self, root: str, accel_prefix: str = None):
+        self.root = root
+        # nginx "internal" location aliased to root, e.g. /protected-audio/
+        self.accel_prefix = accel_prefix
+
+    def relative_path(self, audio_id):
+        key = str(audio_id)
+        return f"{key[-2:]}/{key[-4:-2]}/{key}.mp3"
+
+    def path(self, audio_id):
+        return os.path.join(self.root, *self.relative_path(audio_id).split("/"))
+
+    def put(self, fileobj, audio_id, filename: str, user: str):
+        path = self.path(audio_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(fileobj, out)
+            # mkstemp creates 0600 files; nginx (X-Accel-Redirect) and a server running
+            # as a different user than migrate-audio both need to read them
+            os.chmod(tmp_path, FILE_MODE)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, audio_id):
+        try:
+            return open(self.path(audio_id), "rb")
+        except FileNotFoundError:
+            raise AudioNotFound(str(audio_id))
+
+    def size(self, audio_id):
+        try:
+            return os.path.getsize(self.path(audio_id))
+        except FileNotFoundError:
+            raise AudioNotFound(str(audio_id))
+
+    def delete(self, audio_id):
+        try:
+            os.remove(self.path(audio_id))
+        except FileNotFoundError:
+            pass
+
+    def serve(self, audio_id, request):
+        path = self.path(audio_id)
+        if not os.path.isfile(path):
+            raise AudioNotFound(str(audio_id))
+
+        if self.accel_prefix:
+            # nginx serves the file (including Range requests) from its internal location
+            return Response(
+                media_type="audio/mpeg",
+                headers={"X-Accel-Redirect": self.accel_prefix.rstrip("/") + "/" + self.relative_path(audio_id)},
+            )
+        return FileResponse(path, media_type="audio/mpeg")
+
+
+def migrate_gridfs_to_local(audio_metadata, source: GridFSAudioStore, target: LocalAudioStore, batch_size: int = 100, limit: int = None):
+    """
+    Move GridFS audios to the local store in batches of batch_size.
+    Each audio is copied, its metadata switched to "local", and only then removed
+    from GridFS, so playback keeps working if the migration is interrupted.
+    Returns (migrated, failed).
+    """
+    query = {"storage": {"$in": [None, source.name]}}
+    migrated, failed = 0, 0
+    last_id = None
+
+    while limit is None or migrated + failed < limit:
+        page_query = dict(query, _id={"$gt": last_id}) if last_id else query
+        size = batch_size if limit is None else min(batch_size, limit - migrated - failed)
+        batch = list(audio_metadata.find(page_query, {"audio_id": 1, "filename": 1, "user": 1}).sort("_id", 1).limit(size))
+        if not batch:
+            break
+
+        for record in batch:
+            last_id = record["_id"]
+            audio_id = record["audio_id"]
+            switched = False
+            try:
+                source_file = source.open(audio_id)
+                target.put(source_file, audio_id, record.get("filename"), record.get("user"))
+                if target.size(audio_id) != source_file.length:
+                    raise IOError("size mismatch after copy")
+
+                audio_metadata.update_one(
+                    {"_id": record["_id"]},
+                    {"$set": {"storage": target.name, "size": source_file.length}},
+                )
+                switched = True
+                source.delete(audio_id)
+                migrated += 1
+            except Exception as e:
+                print(f"Failed to migrate audio {audio_id}: {e}")
+                # Reads still go to GridFS, drop the partial copy
+                if not switched:
+                    target.delete(audio_id)
+                failed += 1
+
+        print(f"Migrated {migrated} audios so far ({failed} failed)")
+
+    return migrated, failed
@@ -0,0 +1,117 @@
+"""
+Declarative index registry for the Lysn database.
+
+Every index the hot paths rely on is listed in INDEXES and applied at startup by
+ensure_indexes(). HOT_QUERIES mirrors the query shapes used by the routes so that
+explain_hot_queries() can confirm none of them fall back to a collection scan
+or an in-memory sort.
+"""
+from datetime import timedelta
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+# Stored timestamps come from get_kolkata_time() (naive UTC+5:30), but the TTL
+# monitor compares against real UTC, so the offset is taken off the expiry.
+KOLKATA_OFFSET = timedelta(hours=5, minutes=30)
+SESSION_TIMEOUT = timedelta(days=7)
+
+# { collection: [ (keys, options), ... ] }
+INDEXES = {
+    "users": [
+        ([("email", 1)], {"unique": True}),
+    ],
+    "sessions": [
+        ([("token", 1)], {"unique": True}),
+        ([("email", 1)], {"unique": True}),
+        # Mongo's TTL monitor drops idle sessions (runs roughly once a minute)
+        ([("last_active", 1)], {"expireAfterSeconds": int((SESSION_TIMEOUT - KOLKATA_OFFSET).total_seconds())}),
+    ],
+    "audio_metadata": [
+        # Unique per user to prevent duplicates, also serves lookups by user
+        ([("user", 1), ("filename", 1)], {"unique": True}),
+        ([("audio_id", 1)], {"unique": True}),
+        # Dashboard's "latest N audios" list
+        ([("user", 1), ("uploaded", -1)], {}),
+    ],
+    "user_stats": [
+        ([("user", 1)], {"unique": True}),
+    ],
+}
+
+# (name, collection, filter[, {"sort": ..., "limit": ...}]) for every query issued on a request path
+HOT_QUERIES = [
+    ("get_current_user", "sessions", {"token": "sample-token"}),
+    ("create_session", "sessions", {"email": "user@example.com"}),
+    ("users_by_email", "users", {"email": "user@example.com"}),
+    ("list_audios", "audio_metadata", {"user": "user@example.com"}),
+    ("list_recent_audios", "audio_metadata", {"user": "user@example.com"}, {"sort": {"uploaded": -1}, "limit": 10}),
+    ("upload_duplicate_check", "audio_metadata", {"user": "user@example.com", "filename": "sample.mp3"}),
+    ("get_audio", "audio_metadata", {"audio_id": ObjectId()}),
+    ("delete_audio", "audio_metadata", {"audio_id": ObjectId(), "user": "user@example.com"}),
+    ("library_stats", "user_stats", {"user": "user@example.com"}),
+]
+
+
+def _update_ttl(db, collection, keys, options):
+    """Change expireAfterSeconds on an existing TTL index (create_index refuses to)."""
+    db.command(
+        "collMod",
+        collection,
+        index={"keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]},
+    )
+
+
+def ensure_indexes(db):
+    """
+    Create every index in INDEXES. Failures are reported, not raised, except for
+    TTL indexes: session expiry depends on them, so those must apply or startup fails.
+    """
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            is_ttl = "expireAfterSeconds" in options
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # IndexOptionsConflict: same keys, different TTL (e.g. SESSION_TIMEOUT changed)
+                if is_ttl and e.code == 85:
+                    _update_ttl(db, collection, keys, options)
+                    print(f"✓ Updated TTL on {collection} {keys} to {options['expireAfterSeconds']}s.")
+                elif is_ttl:
+                    raise
+                else:
+                    print(f"Warning: Could not create index {keys} on {collection}: {e}")
+            except Exception as e:
+                if is_ttl:
+                    raise
+                print(f"Warning: Could not create index {keys} on {collection}: {e}")
+    print("✓ Indexing check complete: registry applied.")
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_hot_queries(db):
+    """Run explain on each hot query shape and report the winning plan's stages."""
+    report = []
+    for name, collection, query, *extra in HOT_QUERIES:
+        find = {"find": collection, "filter": query, **(extra[0] if extra else {})}
+        explain = db.command("explain", find, verbosity="queryPlanner")
+        stages = list(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        report.append({
+            "name": name,
+            "collection": collection,
+            "stages": stages,
+            # An in-memory SORT means the (user, uploaded) style index isn't being used
+            "collscan": "COLLSCAN" in stages,
+            "sort": "SORT" in stages,
+        })
+    return report
@@ -0,0 +1,82 @@
+"""
+Maintenance commands for the Lysn backend.
+
+Usage:
+    python manage.py reconcile-stats [--email EMAIL]
+    python manage.py ensure-indexes
+    python manage.py explain-queries
+    python manage.py migrate-audio [--batch-size N] [--limit N]
+"""
+import argparse
+import sys
+
+from app import db, audio_metadata, audio_stores, reconcile_user_stats
+from audio_storage import migrate_gridfs_to_local
+from indexes import ensure_indexes, explain_hot_queries
+
+
+def cmd_reconcile_stats(args):
+    rebuilt = reconcile_user_stats(args.email)
+    target = args.email or "all users"
+    print(f"✓ Rebuilt library stats for {target} ({rebuilt} non-empty libraries).")
+
+
+def cmd_ensure_indexes(args):
+    ensure_indexes(db)
+
+
+def cmd_explain_queries(args):
+    report = explain_hot_queries(db)
+    for row in report:
+        status = "COLLSCAN" if row["collscan"] else "SORT" if row["sort"] else "ok"
+        print(f"[{status:>8}] {row['name']:<24} {row['collection']:<16} {' > '.join(row['stages'])}")
+
+    scans = [row["name"] for row in report if row["collscan"]]
+    sorts = [row["name"] for row in report if row["sort"] and not row["collscan"]]
+    if scans:
+        print(f"Warning: {len(scans)} hot queries use a collection scan: {', '.join(scans)}")
+    if sorts:
+        print(f"Warning: {len(sorts)} hot queries sort in memory: {', '.join(sorts)}")
+    if scans or sorts:
+        sys.exit(1)
+    print("✓ All hot queries are served by an index.")
+
+
+def cmd_migrate_audio(args):
+    migrated, failed = migrate_gridfs_to_local(
+        audio_metadata,
+        audio_stores["gridfs"],
+        audio_stores["local"],
+        batch_size=args.batch_size,
+        limit=args.limit,
+    )
+    print(f"✓ Moved {migrated} audios from GridFS to {audio_stores['local'].root} ({failed} failed).")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lysn maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = subparsers.add_parser("reconcile-stats", help="Rebuild user_stats from audio_metadata")
+    reconcile.add_argument("--email", help="Only rebuild this user's counters")
+    reconcile.set_defaults(func=cmd_reconcile_stats)
+
+    indexes = subparsers.add_parser("ensure-indexes", help="Apply the index registry")
+    indexes.set_defaults(func=cmd_ensure_indexes)
+
+    explain = subparsers.add_parser("explain-queries", help="Explain hot query shapes and flag collection scans and in-memory sorts")
+    explain.set_defaults(func=cmd_explain_queries)
+
+    migrate = subparsers.add_parser("migrate-audio", help="Move GridFS audios to the local filesystem store")
+    migrate.add_argument("--batch-size", type=int, default=100)
+    migrate.add_argument("--limit", type=int, help="Stop after this many audios")
+    migrate.set_defaults(func=cmd_migrate_audio)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
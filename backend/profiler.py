@@ -0,0 +1,242 @@
+"""
+On-demand sampling profiler.
+
+A background thread snapshots every thread's stack with sys._current_frames()
+at a fixed interval and counts identical stacks. Output is in the "collapsed"
+format (frame;frame;frame count), which flamegraph.pl and speedscope read as is.
+Nothing runs unless a sample or a request profile has been asked for.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi.routing import APIRoute
+
+DEFAULT_INTERVAL = 0.005  # 200 Hz
+# Leaf frames in these files are threads parked on a lock or selector, not CPU work
+IDLE_FILES = {"threading.py", "selectors.py", "queue.py"}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+class StackSampler:
+    """
+    Samples every thread, or, when `tags` is given, only the threads it maps.
+    `tags` is a callable returning { thread_id: prefixes }; those samples are
+    counted per prefix in `tagged` instead of `counts`.
+    """
+    def __init__(self, interval: float = DEFAULT_INTERVAL, exclude=(), tags=None):
+        self.interval = interval
+        self.exclude = set(exclude)
+        self.tags = tags
+        self.counts = Counter()
+        self.tagged = {}    # { prefix: Counter }
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="lysn-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.counts
+
+    def _run(self):
+        skip = self.exclude | {threading.get_ident()}
+        while not self._stop.wait(self.interval):
+            tag_map = self.tags() if self.tags else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in skip:
+                    continue
+                prefixes = tag_map.get(thread_id) if tag_map is not None else None
+                if tag_map is not None and not prefixes:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack = ";".join(reversed(stack))
+
+                if prefixes is None:
+                    self.counts[stack] += 1
+                else:
+                    for prefix in prefixes:
+                        self.tagged.setdefault(prefix, Counter())[stack] += 1
+
+
+def collapse(counts: Counter):
+    """Render stack counts as collapsed-stack lines, hottest first."""
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+
+def sample_process(seconds: float, interval: float = DEFAULT_INTERVAL):
+    """Sample every thread of the running process for the given number of seconds."""
+    # The caller just sleeps, leave it out of the profile
+    sampler = StackSampler(interval, exclude={threading.get_ident()})
+    sampler.start()
+    time.sleep(seconds)
+    return sampler.stop()
+
+
+# (RequestProfiler, prefix) while a profiled request is being handled. Starlette
+# copies the context into threadpool workers, so sync endpoints can see it too.
+_active_profile = contextvars.ContextVar("lysn_active_profile", default=None)
+
+
+class RequestProfiler:
+    """
+    Profiles the next K requests whose path starts with an armed prefix
+    (e.g. "/pdf/upload", or "/audio/" for every audio stream). One shared
+    sampler runs while any profiled request is in flight, and it only records
+    the threads serving those requests: the event-loop thread (tagged by the
+    middleware) and the threadpool thread running a sync endpoint (tagged by
+    ProfiledRoute). Async code of other requests sharing the event loop can
+    still appear while a profiled request is waiting.
+    """
+    def __init__(self):
+        self.armed = {}     # { prefix: remaining requests }
+        self.results = {}   # { prefix: Counter }
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._inflight = 0
+        self._threads = {}      # { thread_id: Counter(prefix -> active requests) }
+        self._thread_map = {}   # immutable snapshot of _threads read by the sampler
+
+    def arm(self, prefix: str, count: int):
+        with self._lock:
+            self.armed[prefix] = count
+            self.results[prefix] = Counter()
+
+    def claim(self, path: str):
+        """Reserve one profiled request for path, returns the matched prefix or None."""
+        with self._lock:
+            matches = [prefix for prefix in self.armed if path.startswith(prefix)]
+            if not matches:
+                return None
+            prefix = max(matches, key=len)
+            if self.armed[prefix] <= 1:
+                del self.armed[prefix]
+            else:
+                self.armed[prefix] -= 1
+            return prefix
+
+    def _publish_threads(self):
+        # Swap in a fresh snapshot so the sampler never iterates a dict being mutated
+        self._thread_map = {tid: frozenset(p for p, n in prefixes.items() if n > 0) for tid, prefixes in self._threads.items()}
+
+    def attach(self, thread_id: int, prefix: str):
+        with self._lock:
+            self._threads.setdefault(thread_id, Counter())[prefix] += 1
+            self._publish_threads()
+
+    def detach(self, thread_id: int, prefix: str):
+        with self._lock:
+            prefixes = self._threads.get(thread_id)
+            if prefixes is not None:
+                prefixes[prefix] -= 1
+                if prefixes[prefix] <= 0:
+                    del prefixes[prefix]
+                if not prefixes:
+                    del self._threads[thread_id]
+            self._publish_threads()
+
+    def begin(self, prefix: str):
+        with self._lock:
+            self._inflight += 1
+            if self._sampler is None:
+                self._sampler = StackSampler(tags=lambda: self._thread_map)
+                self._sampler.start()
+
+    def end(self):
+        with self._lock:
+            self._inflight -= 1
+            if self._inflight:
+                return
+            sampler = self._sampler
+            self._sampler = None
+
+        sampler.stop()
+        with self._lock:
+            for prefix, counts in sampler.tagged.items():
+                self.results.setdefault(prefix, Counter()).update(counts)
+
+    def status(self, prefix: str):
+        with self._lock:
+            return {
+                "path": prefix,
+                "remaining": self.armed.get(prefix, 0),
+                "samples": sum(self.results.get(prefix, Counter()).values()),
+            }
+
+    def take(self, prefix: str):
+        with self._lock:
+            return self.results.pop(prefix, Counter())
+
+
+def profile_thread(func):
+    """Tag the worker thread running a sync endpoint while its request is profiled."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        active = _active_profile.get()
+        if active is None:
+            return func(*args, **kwargs)
+
+        profiler, prefix = active
+        thread_id = threading.get_ident()
+        profiler.attach(thread_id, prefix)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.detach(thread_id, prefix)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class wrapping sync endpoints with profile_thread (a contextvar read when idle)."""
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profile_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Plain ASGI middleware so unprofiled requests (including audio streams)
+    only pay for an emptiness check while nothing is armed.
+    """
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        prefix = None
+        if scope["type"] == "http" and self.profiler.armed:
+            prefix = self.profiler.claim(scope["path"])
+        if prefix is None:
+            await self.app(scope, receive, send)
+            return
+
+        loop_thread = threading.get_ident()
+        token = _active_profile.set((self.profiler, prefix))
+        self.profiler.attach(loop_thread, prefix)
+        self.profiler.begin(prefix)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.detach(loop_thread, prefix)
+            _active_profile.reset(token)
+            self.profiler.end()
@@ -0,0 +1,112 @@
+"""
+Text clean-up applied to extracted PDF text before it is sent to TTS.
+
+Running headers, footers and page numbers repeat on every page and would
+otherwise be read aloud once per page. Lines at the top/bottom edge of a page
+that recur on a large share of pages are treated as boilerplate and dropped;
+words split across lines are re-joined and whitespace is collapsed.
+"""
+import re
+import numpy as np
+
+# Upper bound on how many lines at the top and bottom of a page are header/footer
+# candidates. Each window is also capped at a quarter of the page so short pages
+# keep their body text.
+EDGE_LINES = 3
+# A candidate line is boilerplate if it shows up on at least this share of pages
+REPEAT_RATIO = 0.5
+# Headers carrying the page number ("Journal of X, 12") only match once digits are
+# ignored. With few pages, numbered headings ("Section 1", "Section 2", ...) line up
+# with the page index by chance, so that match needs at least this many pages.
+MIN_RUNNING_PAGES = 5
+
+PAGE_NUMBER_RE = re.compile(r"^\s*[-–]?\s*(page\s*)?\d+(\s*(of|/)\s*\d+)?\s*[-–]?\s*$", re.IGNORECASE)
+# Only re-join when the next line continues in lowercase ("exam-\nple")
+HYPHEN_BREAK_RE = re.compile(r"(\w)-[ \t]*\n\s*([a-z])")
+WHITESPACE_RE = re.compile(r"\s+")
+DIGITS_RE = re.compile(r"\d+")
+SEP = "\x1f"
+
+
+def _edge_positions(count: int):
+    """Map line index -> "top"/"bottom" for the header/footer windows of a page."""
+    window = min(EDGE_LINES, max(1, count // 4))
+    positions = {i: "top" for i in range(min(window, count))}
+    # Start the bottom window after the top one so they never overlap
+    positions.update({i: "bottom" for i in range(max(count - window, window), count)})
+    return positions
+
+
+def _candidates(pages: list):
+    """Yield (page_index, line_index, position, raw_key) for every non-empty edge line."""
+    for page_index, page in enumerate(pages):
+        lines = page.splitlines()
+        for i, position in _edge_positions(len(lines)).items():
+            raw = lines[i].strip().lower()
+            if raw:
+                yield page_index, i, position, raw
+
+
+def find_boilerplate(pages: list):
+    """
+    Return (exact, running):
+      exact   - "position|line" keys whose exact text repeats across pages
+      running - "position|masked line" keys whose numbers advance with the page index
+    """
+    if len(pages) < 2:
+        return set(), set()
+    threshold = max(2, int(np.ceil(len(pages) * REPEAT_RATIO)))
+
+    exact_rows, running_rows = set(), set()
+    for page_index, _, position, raw in _candidates(pages):
+        exact_rows.add((page_index, f"{position}{SEP}{raw}"))
+        numbers = DIGITS_RE.findall(raw)
+        if numbers and len(pages) >= MIN_RUNNING_PAGES:
+            masked = f"{position}{SEP}{DIGITS_RE.sub('#', raw)}"
+            # A running page number keeps a constant offset from the page index
+            for slot, number in enumerate(numbers):
+                running_rows.add((page_index, f"{masked}{SEP}{slot}{SEP}{int(number) - page_index}"))
+
+    # Rows are unique per page, so each count is the number of pages a key appears on
+    exact = set()
+    if exact_rows:
+        keys, counts = np.unique(np.array([key for _, key in exact_rows]), return_counts=True)
+        exact = set(keys[counts >= threshold].tolist())
+
+    running = set()
+    if running_rows:
+        keys, counts = np.unique(np.array([key for _, key in running_rows]), return_counts=True)
+        running = {key.rsplit(SEP, 2)[0] for key in keys[counts >= threshold].tolist()}
+
+    return exact, running
+
+
+def normalize_pages(pages: list):
+    """
+    Clean the per-page text from extract_text().
+    Returns (text, chars_removed). chars_removed counts only content that would have
+    been read aloud: dropped boilerplate lines and line-break hyphens. Whitespace
+    changes cost no TTS time and are not counted.
+    """
+    exact, running = find_boilerplate(pages)
+
+    dropped = {}  # { page_index: set(line_index) }
+    chars_removed = 0
+    for page_index, i, position, raw in _candidates(pages):
+        if (
+            f"{position}{SEP}{raw}" in exact
+            or f"{position}{SEP}{DIGITS_RE.sub('#', raw)}" in running
+            or PAGE_NUMBER_RE.match(raw)
+        ):
+            dropped.setdefault(page_index, set()).add(i)
+            chars_removed += len(raw)
+
+    kept_pages = []
+    for page_index, page in enumerate(pages):
+        skip = dropped.get(page_index, set())
+        kept_pages.append("\n".join(line for i, line in enumerate(page.splitlines()) if i not in skip))
+
+    text, hyphens = HYPHEN_BREAK_RE.subn(r"\1\2", "\n".join(kept_pages))
+    text = WHITESPACE_RE.sub(" ", text).strip()
+
+    return text, chars_removed + hyphens
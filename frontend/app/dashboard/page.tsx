@@ -7,6 +7,7 @@ import { Headphones, Library, LogOut, User, Clock, PlayCircle, Trash2, PauseCirc
 import { motion, AnimatePresence } from "framer-motion";
 import { AudioPlayer } from "@/components/audio-player";
 import { useRouter } from "next/navigation";
+import Link from "next/link";
 import { toast } from "sonner";
 import { useAudioPlayer } from "@/contexts/audio-player-context";
 import {
@@ -20,9 +21,13 @@ import {
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 
+// Totals come from /stats, so the dashboard only needs the latest few audios
+const RECENT_AUDIOS_LIMIT = 10;
+
 export default function DashboardPage() {
   const [user, setUser] = useState<any>(null);
   const [audios, setAudios] = useState<any[]>([]);
+  const [stats, setStats] = useState<{ count: number; total_duration: number; total_bytes: number; last_upload: string | null } | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [deletingId, setDeletingId] = useState<string | null>(null);
   const [deleteDialog, setDeleteDialog] = useState<{ open: boolean; audioId: string; filename: string }>({
@@ -41,15 +46,32 @@ export default function DashboardPage() {
     try {
       const userData = await api.auth.getMe() as { user: any };
       setUser(userData.user);
-      const audioData = await api.audio.list();
+      const audioData = await api.audio.list(RECENT_AUDIOS_LIMIT);
       setAudios(audioData.audios);
     } catch (err) {
       router.push("/auth");
     } finally {
       setIsLoading(false);
     }
+
+    // Stats are secondary, a failure here shouldn't log the user out
+    try {
+      const statsData = await api.stats.get();
+      setStats(statsData.stats);
+    } catch (err) {
+      setStats(null);
+    }
   };
 
+  const formatListeningTime = (seconds: number) => {
+    const total = Math.max(0, Math.round(seconds));
+    const h = Math.floor(total / 3600);
+    const m = Math.floor((total % 3600) / 60);
+    return h > 0 ? `${h}h ${m}m` : `${m}m`;
+  };
+
+  const itemCount = stats?.count ?? audios.length;
+
   const handleLogout = async () => {
     await api.auth.logout();
     window.location.href = "/";
@@ -163,9 +185,17 @@ export default function DashboardPage() {
               </div>
               <h2 className="text-lg sm:text-xl font-bold">Your Library</h2>
             </div>
-            <span className="text-xs font-bold text-primary bg-primary/10 px-2.5 py-1 sm:px-3 sm:py-1.5 rounded-full border border-primary/20">
-              {audios.length} <span className="hidden sm:inline">{audios.length === 1 ? 'Item' : 'Items'}</span>
-            </span>
+            <div className="flex items-center gap-2">
+              {stats && stats.total_duration > 0 && (
+                <span className="hidden sm:flex items-center gap-1 text-xs font-bold text-muted-foreground bg-secondary/30 px-3 py-1.5 rounded-full border border-border/50">
+                  <Clock className="h-3 w-3" />
+                  {formatListeningTime(stats.total_duration)}
+                </span>
+              )}
+              <span className="text-xs font-bold text-primary bg-primary/10 px-2.5 py-1 sm:px-3 sm:py-1.5 rounded-full border border-primary/20">
+                {itemCount} <span className="hidden sm:inline">{itemCount === 1 ? 'Item' : 'Items'}</span>
+              </span>
+            </div>
           </div>
 
           <div className="space-y-3 overflow-y-auto overflow-x-hidden p-1 max-h-[400px] sm:max-h-[500px] lg:max-h-[600px] custom-scrollbar -mx-1 px-1">
@@ -228,6 +258,14 @@ export default function DashboardPage() {
                 ))}
               </AnimatePresence>
             )}
+            {itemCount > audios.length && (
+              <Link
+                href="/library"
+                className="block text-center text-xs font-semibold text-muted-foreground hover:text-primary transition-colors py-2"
+              >
+                Showing latest {audios.length} of {itemCount} · View all in Library
+              </Link>
+            )}
           </div>
         </div>
       </div>
@@ -61,10 +61,14 @@ export const api = {
     googleLoginUrl: (origin?: string) => `${API_URL}/auth/google/login${origin ? `?origin=${encodeURIComponent(origin)}` : ''}`,
   },
   audio: {
-    list: () => fetchAPI('/audios_list', { headers: { 'Content-Type': 'application/json' } }),
+    list: (limit?: number) => fetchAPI(`/audios_list${limit ? `?limit=${limit}` : ''}`, { headers: { 'Content-Type': 'application/json' } }),
     getUrl: (id: string) => `${API_URL}/audio/${id}`,
     delete: (id: string) => fetchAPI(`/audio/${id}`, { method: 'DELETE', headers: { 'Content-Type': 'application/json' } }),
   },
+  stats: {
+    get: () => fetchAPI('/stats', { headers: { 'Content-Type': 'application/json' } }),
+    reconcile: () => fetchAPI('/stats/reconcile', { method: 'POST', headers: { 'Content-Type': 'application/json' } }),
+  },
   pdf: {
     upload: async (file: File) => {
       const formData = new FormData();